@@ -181,7 +181,7 @@ def load_folder(folder=None):
                 astronn_model_obj.pool_length = parameter['pool_length']
             else:
                 astronn_model_obj.pool_length = list(parameter['pool_length'])
-    except KeyError or TypeError:
+    except (KeyError, TypeError):
         pass
     try:
         # need to convert to int because of keras do not want array or list
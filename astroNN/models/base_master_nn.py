@@ -330,7 +330,7 @@ class NeuralNetMaster(ABC):
             else:
                 plot_model(self.keras_model, show_shapes=show_shapes, to_file=name, show_layer_names=show_layer_names,
                            rankdir=rankdir)
-        except ImportError or ModuleNotFoundError:
+        except (ImportError, ModuleNotFoundError):
             warnings.warn('Skipped plot_model! graphviz and pydot_ng are required to plot the model architecture',
                           UserWarning)
             pass
@@ -4,9 +4,6 @@
 
 import tensorflow as tf
 import tensorflow.keras as tfk
-import tensorflow_probability as tfp
-
-tfd = tfp.distributions
 
 from astroNN.config import MAGIC_NUMBER
 from astroNN.nn import magic_correction_term, nn_obj_lookup
@@ -139,10 +136,7 @@ def mean_absolute_percentage_error(y_true, y_pred):
     :rtype: tf.Tensor
     :History: 2018-Feb-17 - Written - Henry Leung (University of Toronto)
     """
-    tf_inf = tf.cast(tf.constant(1) / tf.constant(0), tf.float32)
-    epsilon_tensor = tf.cast(tf.constant(tfk.backend.epsilon()), tf.float32)
-
-    diff = tf.abs((y_true - y_pred) / tf.clip_by_value(tf.abs(y_true), epsilon_tensor, tf_inf))
+    diff = tf.abs((y_true - y_pred) / tf.maximum(tf.abs(y_true), epsilon()))
     diff_corrected = tf.where(tf.equal(y_true, MAGIC_NUMBER), tf.zeros_like(y_true), diff)
     return 100. * tf.reduce_mean(diff_corrected, axis=-1) * magic_correction_term(y_true)
 
@@ -159,11 +153,8 @@ def mean_squared_logarithmic_error(y_true, y_pred):
     :rtype: tf.Tensor
     :History: 2018-Feb-17 - Written - Henry Leung (University of Toronto)
     """
-    tf_inf = tf.cast(tf.constant(1) / tf.constant(0), tf.float32)
-    epsilon_tensor = tf.cast(tf.constant(tfk.backend.epsilon()), tf.float32)
-
-    first_log = tf.math.log(tf.clip_by_value(y_pred, epsilon_tensor, tf_inf) + 1.)
-    second_log = tf.math.log(tf.clip_by_value(y_true, epsilon_tensor, tf_inf) + 1.)
+    first_log = tf.math.log(tf.maximum(y_pred, epsilon()) + 1.)
+    second_log = tf.math.log(tf.maximum(y_true, epsilon()) + 1.)
     log_diff = tf.where(tf.equal(y_true, MAGIC_NUMBER), tf.zeros_like(y_true), tf.square(first_log - second_log))
     return tf.reduce_mean(log_diff, axis=-1) * magic_correction_term(y_true)
 
@@ -196,10 +187,7 @@ def mean_percentage_error(y_true, y_pred):
     :rtype: tf.Tensor
     :History: 2018-Jun-06 - Written - Henry Leung (University of Toronto)
     """
-    tf_inf = tf.cast(tf.constant(1) / tf.constant(0), tf.float32)
-    epsilon_tensor = tf.cast(tf.constant(tfk.backend.epsilon()), tf.float32)
-
-    diff = y_true - y_pred / tf.clip_by_value(y_true, epsilon_tensor, tf_inf)
+    diff = y_true - y_pred / tf.maximum(y_true, epsilon())
     diff_corrected = tf.where(tf.equal(y_true, MAGIC_NUMBER), tf.zeros_like(y_true), diff)
     return 100. * tf.reduce_mean(diff_corrected, axis=-1) * magic_correction_term(y_true)
 
@@ -222,18 +210,14 @@ def categorical_crossentropy(y_true, y_pred, from_logits=False):
     correction = magic_correction_term(y_true)
 
     # Deal with magic number
-    y_true = tf.where(tf.equal(y_true, MAGIC_NUMBER), tf.zeros_like(y_true), y_true)
+    y_true = y_true * tf.cast(tf.not_equal(y_true, MAGIC_NUMBER), y_true.dtype)
 
     # Note: tf.nn.softmax_cross_entropy_with_logits expects logits, we expects probabilities by default.
     if not from_logits:
-        epsilon_tensor = tf.cast(tf.constant(tfk.backend.epsilon()), tf.float32)
-        # scale preds so that the class probas of each sample sum to 1
-        y_pred /= tf.reduce_sum(y_pred, len(y_pred.get_shape()) - 1, True)
-        # manual computation of crossentropy
-        y_pred = tf.clip_by_value(y_pred, epsilon_tensor, 1. - epsilon_tensor)
-        return - tf.reduce_sum(y_true * tf.math.log(y_pred), len(y_pred.get_shape()) - 1) * correction
-    else:
-        return tf.nn.softmax_cross_entropy_with_logits(labels=y_true, logits=y_pred) * correction
+        # transform back to logits, softmax of log(probabilities) also takes care of normalization
+        y_pred = tf.math.log(y_pred + epsilon())
+
+    return tf.nn.softmax_cross_entropy_with_logits(labels=y_true, logits=y_pred) * correction
 
 
 def binary_crossentropy(y_true, y_pred, from_logits=False):
@@ -252,13 +236,14 @@ def binary_crossentropy(y_true, y_pred, from_logits=False):
     """
     # Note: tf.nn.sigmoid_cross_entropy_with_logits expects logits, we expects probabilities by default.
     if not from_logits:
-        epsilon_tensor = tf.cast(tf.constant(tfk.backend.epsilon()), tf.float32)
-        # transform back to logits
-        y_pred = tf.clip_by_value(y_pred, epsilon_tensor, 1. - epsilon_tensor)
-        y_pred = tf.math.log(y_pred / (1. - y_pred))
+        # transform back to logits, log(p) - log(1 - p) avoids the division
+        y_pred = tf.clip_by_value(y_pred, epsilon(), 1. - epsilon())
+        y_pred = tf.math.log(y_pred) - tf.math.log1p(-y_pred)
 
-    cross_entropy = tf.nn.sigmoid_cross_entropy_with_logits(labels=y_true, logits=y_pred)
-    corrected_cross_entropy = tf.where(tf.equal(y_true, MAGIC_NUMBER), tf.zeros_like(cross_entropy), cross_entropy)
+    # Deal with magic number, the fused kernel should not see the magic number as labels
+    mask = tf.cast(tf.not_equal(y_true, MAGIC_NUMBER), y_pred.dtype)
+    cross_entropy = tf.nn.sigmoid_cross_entropy_with_logits(labels=y_true * mask, logits=y_pred)
+    corrected_cross_entropy = cross_entropy * mask
 
     return tf.reduce_mean(corrected_cross_entropy, axis=-1) * magic_correction_term(y_true)
 
@@ -333,19 +318,18 @@ def robust_categorical_crossentropy(y_true, y_pred, logit_var):
     """
     variance_depressor = tf.reduce_mean(tf.exp(logit_var) - tf.ones_like(logit_var))
     undistorted_loss = categorical_crossentropy(y_true, y_pred, from_logits=True)
-    dist = tfd.Normal(loc=y_pred, scale=logit_var)
 
     mc_num = 25
     batch_size = tf.shape(y_pred)[0]
-    label_size = tf.shape(y_pred)[-1]
-    mc_result = -tf.nn.elu(tf.tile(undistorted_loss, [mc_num]) - categorical_crossentropy(tf.tile(y_true, [mc_num, 1]),
-                                                                                          tf.reshape(
-                                                                                              dist.sample([mc_num]),
-                                                                                              (batch_size * mc_num,
-                                                                                               label_size)),
-                                                                                          from_logits=True))
+    dist_samples = y_pred + logit_var * tf.random.normal(tf.concat([[mc_num], tf.shape(y_pred)], axis=0),
+                                                         dtype=y_pred.dtype)
+    # evaluate all Monte Carlo samples as one batch
+    distorted_loss = categorical_crossentropy(tf.tile(y_true, [mc_num, 1]),
+                                              tf.reshape(dist_samples, (mc_num * batch_size, -1)),
+                                              from_logits=True)
+    mc_result = -tf.nn.elu(undistorted_loss - tf.reshape(distorted_loss, (mc_num, batch_size)))
 
-    variance_loss = tf.reduce_mean(tf.reshape(mc_result, (mc_num, batch_size)), axis=0) * undistorted_loss
+    variance_loss = tf.reduce_mean(mc_result, axis=0) * undistorted_loss
 
     return (variance_loss + undistorted_loss + variance_depressor) * magic_correction_term(y_true)
 
@@ -420,18 +404,18 @@ def robust_binary_crossentropy(y_true, y_pred, logit_var):
     """
     variance_depressor = tf.reduce_mean(tf.exp(logit_var) - tf.ones_like(logit_var))
     undistorted_loss = binary_crossentropy(y_true, y_pred, from_logits=True)
-    dist = tfd.Normal(loc=y_pred, scale=logit_var)
 
     mc_num = 25
     batch_size = tf.shape(y_pred)[0]
-    label_size = tf.shape(y_pred)[-1]
-    mc_result = -tf.nn.elu(tf.tile(undistorted_loss, [mc_num]) - binary_crossentropy(tf.tile(y_true, [mc_num, 1]),
-                                                                                     tf.reshape(dist.sample([mc_num]),
-                                                                                                (batch_size * mc_num,
-                                                                                                 label_size)),
-                                                                                     from_logits=True))
-
-    variance_loss = tf.reduce_mean(tf.reshape(mc_result, (mc_num, batch_size)), axis=0) * undistorted_loss
+    dist_samples = y_pred + logit_var * tf.random.normal(tf.concat([[mc_num], tf.shape(y_pred)], axis=0),
+                                                         dtype=y_pred.dtype)
+    # evaluate all Monte Carlo samples as one batch
+    distorted_loss = binary_crossentropy(tf.tile(y_true, [mc_num, 1]),
+                                         tf.reshape(dist_samples, (mc_num * batch_size, -1)),
+                                         from_logits=True)
+    mc_result = -tf.nn.elu(undistorted_loss - tf.reshape(distorted_loss, (mc_num, batch_size)))
+
+    variance_loss = tf.reduce_mean(mc_result, axis=0) * undistorted_loss
 
     return (variance_loss + undistorted_loss + variance_depressor) * magic_correction_term(y_true)
 
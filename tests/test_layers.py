@@ -21,13 +21,22 @@ gpu_memory_manage()
 
 
 class LayerCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Data preparation shared by all tests, fixed seed and float32 to match Keras default
+        rng = np.random.default_rng(0)
+        cls.random_xdata = rng.standard_normal((100, 7514), dtype=np.float32)
+        cls.random_xdata_err = 0.1 * rng.standard_normal((100, 7514), dtype=np.float32)
+        cls.random_xdata_1d = cls.random_xdata[:, :, None]
+        cls.random_xdata_2d = rng.standard_normal((100, 28, 28, 1), dtype=np.float32)
+        cls.random_ydata = rng.standard_normal((100, 25), dtype=np.float32)
+
     def test_MCDropout(self):
         print('==========MCDropout tests==========')
         from astroNN.nn.layers import MCDropout
 
         # Data preparation
-        random_xdata = np.random.normal(0, 1, (100, 7514))
-        random_ydata = np.random.normal(0, 1, (100, 25))
+        random_xdata, random_ydata = self.random_xdata, self.random_ydata
 
         input = Input(shape=[7514])
         dense = Dense(100)(input)
@@ -36,7 +45,7 @@ class LayerCase(unittest.TestCase):
         model = Model(inputs=input, outputs=output)
         model.compile(optimizer='sgd', loss='mse')
 
-        model.fit(random_xdata, random_ydata, batch_size=128)
+        model.train_on_batch(random_xdata, random_ydata)
 
         print(model.get_layer('dropout').get_config())
         # make sure dropout is on even in testing phase
@@ -49,8 +58,7 @@ class LayerCase(unittest.TestCase):
         from astroNN.nn.layers import MCGaussianDropout
 
         # Data preparation
-        random_xdata = np.random.normal(0, 1, (100, 7514))
-        random_ydata = np.random.normal(0, 1, (100, 25))
+        random_xdata, random_ydata = self.random_xdata, self.random_ydata
 
         input = Input(shape=[7514])
         dense = Dense(100)(input)
@@ -59,7 +67,7 @@ class LayerCase(unittest.TestCase):
         model = Model(inputs=input, outputs=output)
         model.compile(optimizer='sgd', loss='mse')
 
-        model.fit(random_xdata, random_ydata, batch_size=128)
+        model.train_on_batch(random_xdata, random_ydata)
 
         print(model.get_layer('dropout').get_config())
 
@@ -73,8 +81,7 @@ class LayerCase(unittest.TestCase):
         from astroNN.nn.layers import MCConcreteDropout
 
         # Data preparation
-        random_xdata = np.random.normal(0, 1, (100, 7514))
-        random_ydata = np.random.normal(0, 1, (100, 25))
+        random_xdata, random_ydata = self.random_xdata, self.random_ydata
 
         input = Input(shape=[7514])
         dense = MCConcreteDropout(Dense(100), name='dropout')(input)
@@ -82,7 +89,7 @@ class LayerCase(unittest.TestCase):
         model = Model(inputs=input, outputs=output)
         model.compile(optimizer='sgd', loss='mse')
 
-        model.fit(random_xdata, random_ydata, batch_size=128)
+        model.train_on_batch(random_xdata, random_ydata)
 
         print(model.get_layer('dropout').get_config())
 
@@ -96,8 +103,7 @@ class LayerCase(unittest.TestCase):
         from astroNN.nn.layers import MCSpatialDropout1D
 
         # Data preparation
-        random_xdata = np.random.normal(0, 1, (100, 7514, 1))
-        random_ydata = np.random.normal(0, 1, (100, 25))
+        random_xdata, random_ydata = self.random_xdata_1d, self.random_ydata
 
         input = Input(shape=[7514, 1])
         conv = Conv1D(kernel_initializer='he_normal', padding="same", filters=2, kernel_size=16)(input)
@@ -107,7 +113,7 @@ class LayerCase(unittest.TestCase):
         model = Model(inputs=input, outputs=output)
         model.compile(optimizer='sgd', loss='mse')
 
-        model.fit(random_xdata, random_ydata, batch_size=128)
+        model.train_on_batch(random_xdata, random_ydata)
 
         # make sure dropout is on even in testing phase
         x = model.predict(random_xdata)
@@ -119,8 +125,7 @@ class LayerCase(unittest.TestCase):
         from astroNN.nn.layers import MCSpatialDropout2D
 
         # Data preparation
-        random_xdata = np.random.normal(0, 1, (100, 28, 28, 1))
-        random_ydata = np.random.normal(0, 1, (100, 25))
+        random_xdata, random_ydata = self.random_xdata_2d, self.random_ydata
 
         input = Input(shape=[28, 28, 1])
         conv = Conv2D(kernel_initializer='he_normal', padding="same", filters=2, kernel_size=16)(input)
@@ -130,7 +135,7 @@ class LayerCase(unittest.TestCase):
         model = Model(inputs=input, outputs=output)
         model.compile(optimizer='sgd', loss='mse')
 
-        model.fit(random_xdata, random_ydata, batch_size=128)
+        model.train_on_batch(random_xdata, random_ydata)
 
         # make sure dropout is on even in testing phase
         x = model.predict(random_xdata)
@@ -142,9 +147,8 @@ class LayerCase(unittest.TestCase):
         from astroNN.nn.layers import ErrorProp
 
         # Data preparation
-        random_xdata = np.random.normal(0, 1, (100, 7514))
-        random_xdata_err = np.random.normal(0, 0.1, (100, 7514))
-        random_ydata = np.random.normal(0, 1, (100, 25))
+        random_xdata, random_ydata = self.random_xdata, self.random_ydata
+        random_xdata_err = self.random_xdata_err
 
         input = Input(shape=[7514])
         input_err = Input(shape=[7514])
@@ -154,7 +158,7 @@ class LayerCase(unittest.TestCase):
         model = Model(inputs=[input, input_err], outputs=[output])
         model.compile(optimizer='sgd', loss='mse')
 
-        model.fit([random_xdata, random_xdata_err], random_ydata, batch_size=128)
+        model.train_on_batch([random_xdata, random_xdata_err], random_ydata)
 
         print(model.get_layer('error').get_config())
 
@@ -192,8 +196,7 @@ class LayerCase(unittest.TestCase):
         from astroNN.nn.layers import StopGrad
 
         # Data preparation
-        random_xdata = np.random.normal(0, 1, (100, 7514))
-        random_ydata = np.random.normal(0, 1, (100, 25))
+        random_xdata, random_ydata = self.random_xdata, self.random_ydata
 
         input = Input(shape=[7514])
         output = Dense(25)(input)
@@ -233,8 +236,7 @@ class LayerCase(unittest.TestCase):
         from astroNN.apogee import aspcap_mask
 
         # Data preparation
-        random_xdata = np.random.normal(0, 1, (100, 7514))
-        random_ydata = np.random.normal(0, 1, (100, 25))
+        random_xdata, random_ydata = self.random_xdata, self.random_ydata
 
         input = Input(shape=[7514])
         dense = BoolMask(mask=aspcap_mask("Al", dr=14))(input)
@@ -251,8 +253,7 @@ class LayerCase(unittest.TestCase):
         from astroNN.nn.layers import FastMCInference
 
         # Data preparation
-        random_xdata = np.random.normal(0, 1, (100, 7514))
-        random_ydata = np.random.normal(0, 1, (100, 25))
+        random_xdata, random_ydata = self.random_xdata, self.random_ydata
 
         input = Input(shape=[7514])
         dense = Dense(100)(input)
@@ -260,7 +261,7 @@ class LayerCase(unittest.TestCase):
         model = Model(inputs=input, outputs=output)
         model.compile(optimizer='sgd', loss='mse')
 
-        model.fit(random_xdata, random_ydata, batch_size=128)
+        model.train_on_batch(random_xdata, random_ydata)
 
         acc_model = FastMCInference(10)(model)
 
@@ -291,13 +292,6 @@ class LayerCase(unittest.TestCase):
         print('==========BoolMask tests==========')
         from astroNN.nn.layers import TensorInput
 
-        # Data preparation
-        random_xdata = np.random.normal(0, 1, (100, 7514))
-        random_ydata = np.random.normal(0, 1, (100, 25))
-
-        # Data preparation
-        random_xdata = np.random.normal(0, 1, (100, 7514))
-        random_ydata = np.random.normal(0, 1, (100, 25))
         input1 = Input(shape=[7514], name='input')
         input2 = TensorInput(tensor=tf.random.normal(mean=0., stddev=1., shape=tf.shape(input1)))([])
         output = Dense(25, name='dense')(concatenate([input1, input2]))
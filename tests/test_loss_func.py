@@ -12,7 +12,7 @@ cpu_fallback()
 from astroNN.config import MAGIC_NUMBER
 from astroNN.nn import magic_correction_term, reduce_var
 from astroNN.nn.losses import mean_absolute_error, mean_squared_error, categorical_crossentropy, binary_crossentropy, \
-    nll, mean_error, zeros_loss, mean_percentage_error
+    nll, mean_error, zeros_loss, mean_percentage_error, robust_categorical_crossentropy, robust_binary_crossentropy
 from astroNN.nn.metrics import categorical_accuracy, binary_accuracy, mean_absolute_percentage_error, \
     mean_squared_logarithmic_error
 
@@ -114,6 +114,16 @@ class LossFuncTestCase(unittest.TestCase):
 
         npt.assert_array_almost_equal(categorical_crossentropy(y_true, y_pred_softmax).numpy(),
                                       categorical_crossentropy(y_true, y_pred, from_logits=True).numpy(), decimal=3)
+        # make sure probabilities not summing to 1 are still normalized
+        npt.assert_array_almost_equal(categorical_crossentropy(y_true, 2. * y_pred_softmax).numpy(),
+                                      categorical_crossentropy(y_true, y_pred_softmax).numpy(), decimal=3)
+
+        # make sure saturated logits and probabilities do not give inf/nan
+        y_pred_saturated = tf.constant([[1000., 0., -1000.], [-1000., 0., 1000.]])
+        y_pred_saturated_softmax = tf.nn.softmax(y_pred_saturated)
+        self.assertEqual(np.all(np.isfinite(categorical_crossentropy(y_true, y_pred_saturated,
+                                                                     from_logits=True).numpy())), True)
+        self.assertEqual(np.all(np.isfinite(categorical_crossentropy(y_true, y_pred_saturated_softmax).numpy())), True)
 
     def test_binary_crossentropy(self):
         y_pred = tf.constant([[0.5, 0., 1.], [2., 0., -1.]])
@@ -133,6 +143,74 @@ class LossFuncTestCase(unittest.TestCase):
         npt.assert_array_almost_equal(binary_crossentropy(y_true, y_pred_sigmoid).numpy(),
                                       binary_crossentropy(y_true, y_pred_2_sigmoid).numpy(), decimal=3)
 
+    def test_robust_crossentropy(self):
+        y_pred = tf.constant([[0.5, 0., 1.], [2., 0., -1.], [1., 1., 3.]])
+        y_true = tf.constant([[1., MAGIC_NUMBER, 0.], [1., MAGIC_NUMBER, 0.], [0., 0., 1.]])
+        # with zero variance, Monte Carlo samples are identical to the undistorted prediction
+        logit_var = tf.zeros_like(y_pred)
+
+        robust_categorical = robust_categorical_crossentropy(y_true, y_pred, logit_var).numpy()
+        self.assertEqual(robust_categorical.shape, (3,))
+        npt.assert_array_almost_equal(robust_categorical,
+                                      (categorical_crossentropy(y_true, y_pred, from_logits=True) *
+                                       magic_correction_term(y_true)).numpy(), decimal=5)
+
+        robust_binary = robust_binary_crossentropy(y_true, y_pred, logit_var).numpy()
+        self.assertEqual(robust_binary.shape, (3,))
+        npt.assert_array_almost_equal(robust_binary,
+                                      (binary_crossentropy(y_true, y_pred, from_logits=True) *
+                                       magic_correction_term(y_true)).numpy(), decimal=5)
+
+        # with nonzero variance, Monte Carlo noise must change the loss
+        logit_var = 0.5 * tf.ones_like(y_pred)
+        tf.random.set_seed(42)
+        robust_categorical_noisy = robust_categorical_crossentropy(y_true, y_pred, logit_var).numpy()
+        self.assertEqual(robust_categorical_noisy.shape, (3,))
+        self.assertEqual(np.all(np.isfinite(robust_categorical_noisy)), True)
+        self.assertEqual(np.any(np.not_equal(robust_categorical_noisy, robust_categorical)), True)
+
+        tf.random.set_seed(42)
+        robust_binary_noisy = robust_binary_crossentropy(y_true, y_pred, logit_var).numpy()
+        self.assertEqual(robust_binary_noisy.shape, (3,))
+        self.assertEqual(np.all(np.isfinite(robust_binary_noisy)), True)
+        self.assertEqual(np.any(np.not_equal(robust_binary_noisy, robust_binary)), True)
+
+        # make sure neural network prediction won't matter for magic number term, with the same noise
+        y_pred_2 = tf.constant([[0.5, 5., 1.], [2., -3., -1.], [1., 1., 3.]])
+        tf.random.set_seed(42)
+        robust_binary_noisy_2 = robust_binary_crossentropy(y_true, y_pred_2, logit_var).numpy()
+        npt.assert_array_almost_equal(robust_binary_noisy, robust_binary_noisy_2, decimal=5)
+
+    def test_robust_crossentropy_mc_noise(self):
+        # compare Monte Carlo term against expectation under logits ~ Normal(y_pred, logit_var)
+        batch_size, logit, std = 4000, 0.5, 2.
+        rng = np.random.default_rng(0)
+        eps = rng.standard_normal((1000000, 2))
+        variance_depressor = np.exp(std) - 1.
+
+        def expected_mc_term(undistorted, distorted):
+            x = undistorted - distorted
+            return np.mean(-np.where(x > 0., x, np.expm1(x)))
+
+        tf.random.set_seed(42)
+        y_true = tf.ones((batch_size, 1))
+        y_pred = logit * tf.ones((batch_size, 1))
+        logit_var = std * tf.ones((batch_size, 1))
+        undistorted = np.logaddexp(0., -logit)
+        robust_binary = np.mean(robust_binary_crossentropy(y_true, y_pred, logit_var).numpy())
+        npt.assert_almost_equal((robust_binary - undistorted - variance_depressor) / undistorted,
+                                expected_mc_term(undistorted, np.logaddexp(0., -(logit + std * eps[:, 0]))),
+                                decimal=2)
+
+        y_true = tf.constant([[1., 0.]] * batch_size)
+        y_pred = tf.constant([[logit, 0.]] * batch_size)
+        logit_var = std * tf.ones((batch_size, 2))
+        undistorted = np.logaddexp(logit, 0.) - logit
+        distorted = np.logaddexp(logit + std * eps[:, 0], std * eps[:, 1]) - (logit + std * eps[:, 0])
+        robust_categorical = np.mean(robust_categorical_crossentropy(y_true, y_pred, logit_var).numpy())
+        npt.assert_almost_equal((robust_categorical - undistorted - variance_depressor) / undistorted,
+                                expected_mc_term(undistorted, distorted), decimal=2)
+
     def test_negative_log_likelihood(self):
         y_pred = tf.constant([[0.5, 0., 1.], [2., 0., -1.]])
         y_true = tf.constant([[1., MAGIC_NUMBER, 1.], [1., MAGIC_NUMBER, 0.]])